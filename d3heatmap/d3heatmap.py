@@ -15,13 +15,19 @@ import tempfile
 from shutil import copyfile
 import os
 import time
+import base64
+import io
+import hashlib
 from ismember import ismember
 
 curpath = os.path.dirname(os.path.abspath(__file__))
+# Limits of the output cache: total size in MB and age in days.
+CACHE_MAXSIZE = 500
+CACHE_MAXAGE = 30
 
 
 # %%
-def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None, vmax=None, width=720, height=720, showfig=True, stroke='red', verbose=3):
+def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None, vmax=None, width=720, height=720, showfig=True, stroke='red', overview=False, cache=False, dtype=None, verbose=3):
     """Heatmap in d3js.
 
     Parameters
@@ -51,6 +57,20 @@ def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None,
             * 'black'
     showfig : Bool, (default: True)
         Open browser with heatmap.
+    overview : Bool or String, (default: False)
+        Embed a pre-rendered PNG image of the matrix that is shown immediately while the interactive heatmap is loading.
+            * False : No overview image.
+            * True : The overview image is replaced by the interactive heatmap once it is ready.
+            * 'click' : The overview image is replaced by the interactive heatmap when the user clicks on it.
+    cache : Bool or String, (default: False)
+        Re-use the rendered html when the input data and all parameters are the same as in a previous call.
+        The cache is limited to CACHE_MAXSIZE (MB) and CACHE_MAXAGE (days); the oldest files are removed first.
+            * False : No caching.
+            * True : Cache in the user temp directory.
+            * 'c://temp/d3heatmap_cache/' : Cache in the specified directory.
+    dtype : numpy dtype, (default: None)
+        Floating dtype of the values in the pipeline, such as 'float32' or 'float16'. A smaller dtype reduces the memory usage for large matrices.
+            * None : The dtype of the input data is used (float64 when the data is scaled).
     verbose : int [0-5], (default: 3)
         Verbosity to print the working-status. The higher the number, the more information.
             * 0: None
@@ -83,15 +103,7 @@ def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None,
         description = "This heatmap is created in d3js using https://github.com/erdogant/d3heatmap.\n\nA network can be represented by an adjacency matrix, where each cell ij represents an edge from vertex i to vertex j.\n\nGiven this two-dimensional representation of a graph, a natural visualization is to show the matrix! However, the effectiveness of a matrix diagram is heavily dependent on the order of rows and columns: if related nodes are placed closed to each other, it is easier to identify clusters and bridges.\nWhile path-following is harder in a matrix view than in a node-link diagram, matrices have other advantages. As networks get large and highly connected, node-link diagrams often devolve into giant hairballs of line crossings. Line crossings are impossible with matrix views. Matrix cells can also be encoded to show additional data; here color depicts clusters computed by a community-detection algorithm."
     if isinstance(color, str) and color=='cluster':
         color=None
-
-    # Rescale data
-    if vmax is not None:
-        df = _scale(df, vmax=vmax, make_round=False, verbose=verbose)
-    # if vmin is None:
-        # vmin = np.min(df.values)
-    if vmax is None:
-        vmax = np.max(df.values)
-        if verbose>=3: print('[d3heatmap] >Set vmax: %.0g.' %(vmax))
+    _check_dtype(dtype)
 
     # Get path to files
     d3_library = os.path.abspath(os.path.join(curpath, 'd3js/d3.v2.min.js'))
@@ -100,6 +112,26 @@ def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None,
     # Check path
     filename, dirpath, path = _path_check(path, verbose)
 
+    # Re-use the rendered html from cache
+    if cache:
+        from d3heatmap import __version__
+        with open(d3_script, 'r', encoding="utf8", errors='ignore') as file: template = file.read()
+        cache_path = _cache_path(cache, df, template, [__version__, color, title, description, vmax, width, height, stroke, overview, dtype])
+        if _cache_load(cache_path, path, verbose=verbose):
+            if showfig: webbrowser.open(path, new=1)
+            return _output_paths(filename, dirpath, path)
+
+    # Rescale data
+    if vmax is not None:
+        df = _scale(df, vmax=vmax, make_round=False, dtype=dtype, verbose=verbose)
+    elif dtype is not None:
+        df = df.astype(dtype)
+    # if vmin is None:
+        # vmin = _minmax(df.values)[0]
+    if vmax is None:
+        vmax = _minmax(df.values)[1]
+        if verbose>=3: print('[d3heatmap] >Set vmax: %.0g.' %(vmax))
+
     # Copy files to destination directory
     # copyfile(d3_library, os.path.join(dirpath, os.path.basename(d3_library)))
     copyfile(d3_script, path)
@@ -115,9 +147,7 @@ def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None,
         dfvec['target'] = dfvec['target'].replace(node, i)
 
     # Write to disk (file is not used)
-    basename, ext = os.path.splitext(filename)
-    PATHNAME_TO_CSV = os.path.join(dirpath, basename + '.csv')
-    # dfvec.to_csv(PATHNAME_TO_CSV, index=False)
+    # dfvec.to_csv(_output_paths(filename, dirpath, path)['csv'], index=False)
 
     # Cluster the nodes
     if color is None:
@@ -125,6 +155,12 @@ def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None,
         results = ce.fit(df.values)
         color = results['labx']
 
+    # Pre-render the overview image
+    datauri = None
+    if overview:
+        datauri = _overview_heatmap(df, nodes, color, width, verbose=verbose)
+    OVERVIEW_STR, RENDER_STR = _overview_html(datauri, overview, left=0, top=80, width=width, height=width)
+
     # Embed the Data in the HTML. Note that the embedding is an important stap te prevent security issues by the browsers.
     # Most (if not all) browser do not accept to read a file using d3.csv or so. It then requires security-by-passes, but thats not the way to go.
     # An alternative is use local-host and CORS but then the approach is not user-friendly coz setting up this, is not so straightforward.
@@ -174,23 +210,22 @@ def heatmap(df, color='cluster', path=None, title='d3heatmap', description=None,
     d3graphscript = d3graphscript.replace('$STROKE$', str(stroke))
     d3graphscript = d3graphscript.replace('$DATA_PATH$', filename)
     d3graphscript = d3graphscript.replace('$DATA_COMES_HERE$', DATA_STR)
+    d3graphscript = d3graphscript.replace('$OVERVIEW$', OVERVIEW_STR)
+    d3graphscript = d3graphscript.replace('$RENDER$', RENDER_STR)
 
     # Write to file
     with open(path, 'w', encoding="utf8", errors='ignore') as file: file.write(d3graphscript)
+    # Store in cache
+    if cache: _cache_store(path, cache_path, verbose=verbose)
     # Open browser with heatmap
     if showfig: webbrowser.open(path, new=1)
 
     # Return
-    out = {}
-    out['filename'] = filename
-    out['dirpath'] = dirpath
-    out['path'] = path
-    out['csv'] = PATHNAME_TO_CSV
-    return out
+    return _output_paths(filename, dirpath, path)
 
 
 # %%
-def matrix(df, path=None, title='d3heatmap', description='Heatmap description', width=500, height=500, fontsize=10, cmap='interpolateInferno', scale=False, vmin=None, vmax=None, showfig=True, stroke='red', overwrite=True, verbose=3):
+def matrix(df, path=None, title='d3heatmap', description='Heatmap description', width=500, height=500, fontsize=10, cmap='interpolateInferno', scale=False, vmin=None, vmax=None, showfig=True, stroke='red', overwrite=True, overview=False, cache=False, dtype=None, verbose=3):
     """Heatmap in d3 javascript.
 
     Parameters
@@ -227,6 +262,20 @@ def matrix(df, path=None, title='d3heatmap', description='Heatmap description',
         Open browser with heatmap.
     overwrite : Bool, (default: False)
         Overwrite existing file on the path location.
+    overview : Bool or String, (default: False)
+        Embed a pre-rendered PNG image of the matrix that is shown immediately while the interactive heatmap is loading.
+            * False : No overview image.
+            * True : The overview image is replaced by the interactive heatmap once it is ready.
+            * 'click' : The overview image is replaced by the interactive heatmap when the user clicks on it.
+    cache : Bool or String, (default: False)
+        Re-use the rendered html when the input data and all parameters are the same as in a previous call.
+        The cache is limited to CACHE_MAXSIZE (MB) and CACHE_MAXAGE (days); the oldest files are removed first.
+            * False : No caching.
+            * True : Cache in the user temp directory.
+            * 'c://temp/d3heatmap_cache/' : Cache in the specified directory.
+    dtype : numpy dtype, (default: None)
+        Floating dtype of the values in the pipeline, such as 'float32' or 'float16'. A smaller dtype reduces the memory usage for large matrices.
+            * None : The dtype of the input data is used (float64 when the data is scaled).
     cmap : String, (default: 'interpolateInferno').
         The colormap scheme. This can be found at: https://github.com/d3/d3-scale-chromatic.
         Categorical:
@@ -266,6 +315,7 @@ def matrix(df, path=None, title='d3heatmap', description='Heatmap description',
         output path names.
 
     """
+    _check_dtype(dtype)
     if cmap in ['schemeCategory10', 'schemeAccent', 'schemeDark2', 'schemePaired', 'schemePastel2', 'schemePastel1', 'schemeSet1', 'schemeSet2', 'schemeSet3', 'schemeTableau10']:
         cmap_type='scaleOrdinal'
         if verbose>=3: print('[d3heatmap] >d3 cmap type is set to %s' %(cmap_type))
@@ -277,43 +327,63 @@ def matrix(df, path=None, title='d3heatmap', description='Heatmap description',
     if len(df.index.unique())!=len(df.index):
         if verbose>=2: print('[d3heatmap] >Warning: Input data should contain unique index names otherwise d3js randomly removes the non-unique ones.')
 
+    # Get path to files
+    d3_library = os.path.abspath(os.path.join(curpath, 'd3js/d3.v4.js'))
+    d3_chromatic = os.path.abspath(os.path.join(curpath, 'd3js/d3.scale.chromatic.v1.min.js'))
+    d3_script = os.path.abspath(os.path.join(curpath, 'd3js/d3script.html'))
+
+    # Check path
+    filename, dirpath, path = _path_check(path, verbose)
+
+    # Copy files to destination directory
+    copyfile(d3_library, os.path.join(dirpath, os.path.basename(d3_library)))
+    copyfile(d3_chromatic, os.path.join(dirpath, os.path.basename(d3_chromatic)))
+
+    # Re-use the rendered html from cache
+    if cache:
+        from d3heatmap import __version__
+        with open(d3_script, 'r', encoding="utf8", errors='ignore') as file: template = file.read()
+        cache_path = _cache_path(cache, df, template, [__version__, title, description, width, height, fontsize, cmap, scale, vmin, vmax, stroke, overview, dtype])
+        if (overwrite or not os.path.isfile(path)) and _cache_load(cache_path, path, verbose=verbose):
+            if showfig: webbrowser.open(path, new=1)
+            return _output_paths(filename, dirpath, path)
+
     # Rescale data between 0-100
     if scale:
-        df = _scale(df, verbose=verbose)
+        df = _scale(df, dtype=dtype, verbose=verbose)
+    elif dtype is not None:
+        df = df.astype(dtype)
     if (not scale) and (vmin is not None) and (vmax is not None):
         if verbose>=3: print('[d3heatmap] >Data is not scaled. Tip: set vmin=None and vmax=None to range colors between min-max of your data.')
-    if vmin is None:
-        vmin = np.min(df.values)
-    if vmax is None:
-        vmax = np.max(df.values)
+    if (vmin is None) or (vmax is None):
+        xmin, xmax = _minmax(df.values)
+        vmin = xmin if vmin is None else vmin
+        vmax = xmax if vmax is None else vmax
     if verbose>=3: print('[d3heatmap] >vmin is set to: %g' %(vmin))
     if verbose>=3: print('[d3heatmap] >vmax is set to: %g' %(vmax))
 
-    # Get path to files
-    d3_library = os.path.abspath(os.path.join(curpath, 'd3js/d3.v4.js'))
-    d3_chromatic = os.path.abspath(os.path.join(curpath, 'd3js/d3.scale.chromatic.v1.min.js'))
-    d3_script = os.path.abspath(os.path.join(curpath, 'd3js/d3script.html'))
-
     # Set fontsize for x-axis, y-axis
     fontsize_x = fontsize
     fontsize_y = fontsize
 
-    # Check path
-    filename, dirpath, path = _path_check(path, verbose)
-
     # Copy files to destination directory
-    copyfile(d3_library, os.path.join(dirpath, os.path.basename(d3_library)))
-    copyfile(d3_chromatic, os.path.join(dirpath, os.path.basename(d3_chromatic)))
     copyfile(d3_script, path)
 
+    # Pre-render the overview image in the plotting area (the margins are set in d3script.html)
+    datauri = None
+    if overview:
+        if cmap_type=='scaleOrdinal':
+            if verbose>=2: print('[d3heatmap] >Warning: Overview image is not supported for categorical cmap [%s].' %(cmap))
+        else:
+            datauri = _overview_matrix(df, cmap, vmin, vmax, width - 40 - 25, height - 80 - 30, verbose=verbose)
+    OVERVIEW_STR, RENDER_STR = _overview_html(datauri, overview, left=40, top=80, width=width - 40 - 25, height=height - 80 - 30)
+
     # Convert into adj into vector
     dfvec = adjmat2vec(df)
     dfvec = dfvec.rename(columns={'source': 'variable', 'target': 'group', 'weight': 'value'})
 
     # Write to disk (file is not used)
-    basename, ext = os.path.splitext(filename)
-    PATHNAME_TO_CSV = os.path.join(dirpath, basename + '.csv')
-    # dfvec.to_csv(PATHNAME_TO_CSV, index=False)
+    # dfvec.to_csv(_output_paths(filename, dirpath, path)['csv'], index=False)
 
     # Embed the Data in the HTML. Note that the embedding is an important stap te prevent security issues by the browsers.
     # Most (if not all) browser do not accept to read a file using d3.csv or so. It then requires security-by-passes, but thats not the way to go.
@@ -356,6 +426,8 @@ def matrix(df, path=None, title='d3heatmap', description='Heatmap description',
 
     d3graphscript = d3graphscript.replace('$DATA_PATH$', filename)
     d3graphscript = d3graphscript.replace('$DATA_COMES_HERE$', DATA_STR)
+    d3graphscript = d3graphscript.replace('$OVERVIEW$', OVERVIEW_STR)
+    d3graphscript = d3graphscript.replace('$RENDER$', RENDER_STR)
 
     # Delete file if exists
     if overwrite:
@@ -366,18 +438,15 @@ def matrix(df, path=None, title='d3heatmap', description='Heatmap description',
         # Write to file
         if verbose>=3: print('[d3heatmap] >Writing to disk..')
         with open(path, 'w', encoding="utf8", errors='ignore') as file: file.write(d3graphscript)
+        # Store in cache
+        if cache: _cache_store(path, cache_path, verbose=verbose)
         # Sleep a bit to make sure file is written
         time.sleep(0.5)
         # Open browser with heatmap
         if showfig: webbrowser.open(path, new=1)
 
     # Return
-    out = {}
-    out['filename'] = filename
-    out['dirpath'] = dirpath
-    out['path'] = path
-    out['csv'] = PATHNAME_TO_CSV
-    return out
+    return _output_paths(filename, dirpath, path)
 
 
 # %% Import example dataset from github.
@@ -430,18 +499,145 @@ def _path_check(path, verbose):
     return filename, dirpath, path
 
 
+# %%
+def _output_paths(filename, dirpath, path):
+    basename, ext = os.path.splitext(filename)
+    out = {}
+    out['filename'] = filename
+    out['dirpath'] = dirpath
+    out['path'] = path
+    out['csv'] = os.path.join(dirpath, basename + '.csv')
+    return out
+
+
+# %% Output cache
+def _cache_path(cache, df, template, params):
+    """Path of the cached html for the input data and the rendering parameters.
+
+    Parameters
+    ----------
+    cache : Bool or String
+        True for the user temp directory or the path to the cache directory.
+    df : pd.DataFrame()
+        Input data.
+    template : String
+        Contents of the d3 html template.
+    params : list
+        Rendering parameters, including the package version.
+
+    Returns
+    -------
+    String
+        Path to the html file in the cache directory.
+
+    """
+    cache_dir = os.path.join(tempfile.gettempdir(), 'd3heatmap_cache') if cache is True else str(cache)
+    h = hashlib.sha256()
+    # Values with index, column names and dtypes
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    h.update(pd.util.hash_array(df.columns.astype(str).values).tobytes())
+    h.update(str(df.dtypes.astype(str).tolist()).encode())
+    h.update(template.encode('utf8', errors='ignore'))
+    for param in params:
+        # repr truncates large arrays
+        if isinstance(param, (np.ndarray, pd.Series)):
+            h.update(pd.util.hash_array(np.asarray(param).ravel()).tobytes())
+        else:
+            h.update(repr(param).encode())
+        h.update(b'|')
+    return os.path.join(cache_dir, h.hexdigest() + '.html')
+
+
+def _cache_load(cache_path, path, verbose=3):
+    # Copy the cached html to path. Returns False when there is no cached html.
+    if not os.path.isfile(cache_path):
+        return False
+    try:
+        copyfile(cache_path, path)
+        # Mark as recently used
+        os.utime(cache_path)
+    except FileNotFoundError:
+        # Removed by a concurrent eviction
+        return False
+    if verbose>=3: print('[d3heatmap] >Copy from cache [%s].' %(cache_path))
+    return True
+
+
+def _cache_store(path, cache_path, verbose=3):
+    # Copy the rendered html into the cache and remove the oldest files.
+    # The copy is written to a temporary file first so that concurrent jobs never read a partially written html.
+    cache_dir = os.path.dirname(cache_path)
+    tmppath = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+        os.close(fd)
+        copyfile(path, tmppath)
+        os.replace(tmppath, cache_path)
+        _cache_evict(cache_dir, maxsize=CACHE_MAXSIZE, maxage=CACHE_MAXAGE)
+    except OSError as e:
+        if verbose>=2: print('[d3heatmap] >Warning: Could not write to cache [%s]: %s' %(cache_dir, e))
+        if tmppath is not None and os.path.isfile(tmppath): os.remove(tmppath)
+
+
+def _cache_evict(cache_dir, maxsize=500, maxage=30):
+    """Remove cached html files that are older than maxage (days) or exceed maxsize (MB) in total.
+
+    Parameters
+    ----------
+    cache_dir : String
+        Path to the cache directory.
+    maxsize : float, (default: 500)
+        Maximum total size in MB. The least recently used files are removed first.
+    maxage : float, (default: 30)
+        Maximum age in days.
+
+    Returns
+    -------
+    list of String
+        The removed files.
+
+    """
+    files = []
+    for f in [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.html')]:
+        try:
+            stat = os.stat(f)
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, f))
+    files = sorted(files, reverse=True)
+    now, total, removed = time.time(), 0, []
+    for mtime, size, f in files:
+        if (now - mtime) > maxage * 86400 or (total + size) > maxsize * 1024**2:
+            try:
+                os.remove(f)
+                removed.append(f)
+            except FileNotFoundError:
+                pass
+        else:
+            total = total + size
+    return removed
+
+
 # %% Scaling
-def _scale(X, vmax=100, make_round=True, verbose=3):
+def _scale(X, vmax=100, make_round=True, dtype=None, verbose=3):
     """Scale data.
 
     Description
     -----------
     Scaling in range by X*(100/max(X))
+    The input data is copied once into the output dtype and all steps are performed in-place on that copy.
 
     Parameters
     ----------
     X : array-like
         Input image data.
+    vmax : float (default : 100)
+        Maximum value after scaling.
+    make_round : Bool (default : True)
+        Round the scaled values.
+    dtype : numpy dtype (default : None)
+        Floating dtype of the scaled data, such as 'float32'. None: the input dtype for floats, otherwise float64.
     verbose : int (default : 3)
         Print to screen. 0: None, 1: Error, 2: Warning, 3: Info, 4: Debug, 5: Trace.
 
@@ -451,20 +647,275 @@ def _scale(X, vmax=100, make_round=True, verbose=3):
         Scaled image.
 
     """
+    _check_dtype(dtype)
     if verbose>=3: print('[d3heatmap] >Scaling image between [min-100]')
     try:
-        # Normalizing between 0-100
+        # Read the data without a copy where possible
+        values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+        if dtype is None:
+            dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+        # The maximum is taken from the source data so that values outside the range of dtype (such as >65504 for float16) do not overflow.
+        xmax = _minmax(values)[1]
+        # Normalizing between 0-100 in a single pass into the output dtype
         # X = X - X.min()
-        X = X / X.max().max()
-        X = X * vmax
+        out = np.empty(values.shape, dtype=dtype)
+        np.multiply(values, np.float64(vmax) / np.float64(xmax), out=out, casting='unsafe')
         if make_round:
-            X = np.round(X)
+            np.round(out, out=out)
+        X = pd.DataFrame(out, index=X.index, columns=X.columns, copy=False) if isinstance(X, pd.DataFrame) else out
     except:
         if verbose>=2: print('[d3heatmap] >Warning: Scaling not possible.')
 
     return X
 
 
+def _check_dtype(dtype):
+    # Scaling and the color range require a floating dtype.
+    if (dtype is not None) and (not np.issubdtype(np.dtype(dtype), np.floating)):
+        raise ValueError('[d3heatmap] >dtype should be a floating dtype, such as "float32" or "float16", but is [%s].' %(dtype))
+
+
+def _minmax(X, chunksize=2**20):
+    """Minimum and maximum value in a single pass over the data.
+
+    Description
+    -----------
+    The data is processed in blocks so that each block is read once for both the minimum and maximum.
+    NaN values are ignored.
+
+    Parameters
+    ----------
+    X : array-like
+        Input data.
+    chunksize : int (default : 2**20)
+        Number of values per block.
+
+    Returns
+    -------
+    tuple
+        (minimum, maximum)
+
+    """
+    # ravel returns a view for C- and F-contiguous data
+    X = np.asarray(X).ravel(order='K')
+    if X.size==0:
+        return np.nan, np.nan
+    xmin, xmax = np.fmin.reduce(X[:chunksize]), np.fmax.reduce(X[:chunksize])
+    for i in range(chunksize, X.size, chunksize):
+        block = X[i:i + chunksize]
+        xmin = np.fmin(xmin, np.fmin.reduce(block))
+        xmax = np.fmax(xmax, np.fmax.reduce(block))
+    return xmin, xmax
+
+
+# %% Pre-rendered overview image
+def _overview_matrix(df, cmap, vmin, vmax, width, height, verbose=3):
+    """Rasterize the matrix in the same way as d3script.html draws the cells.
+
+    Parameters
+    ----------
+    df : pd.DataFrame()
+        Input data.
+    cmap : String
+        d3 colormap, such as 'interpolateInferno'.
+    vmin : float
+        Minimum value of the color range.
+    vmax : float
+        Maximum value of the color range.
+    width : int
+        Width of the plotting area in pixels.
+    height : int
+        Height of the plotting area in pixels.
+    verbose : int (default : 3)
+        Print to screen. 0: None, 1: Error, 2: Warning, 3: Info, 4: Debug, 5: Trace.
+
+    Returns
+    -------
+    String or None
+        PNG image as data URI.
+
+    """
+    colormap = _get_colormap(cmap, verbose=verbose)
+    if colormap is None: return None
+    if verbose>=3: print('[d3heatmap] >Rendering overview image.')
+
+    # Only the cells with weight>=0 are drawn (see adjmat2vec). Rows and columns without cells are not in the band domain of d3,
+    # and the columns are ordered by their first appearance in the (row-wise) data.
+    X = np.asarray(df.values)
+    valid = X>=0
+    rows = np.flatnonzero(valid.any(axis=1))
+    cols = np.flatnonzero(valid.any(axis=0))
+    cols = cols[np.argsort(np.argmax(valid, axis=0)[cols], kind='stable')]
+    del valid
+    if len(rows)==0:
+        if verbose>=2: print('[d3heatmap] >Warning: Overview image is skipped because there are no cells with values>=0.')
+        return None
+    if len(rows)<X.shape[0] or np.any(cols!=np.arange(X.shape[1])):
+        X = X[np.ix_(rows, cols)]
+    # The first row is drawn at the bottom of the y-axis
+    X = _block_mean(X[::-1, :], (max(int(height), 1), max(int(width), 1)), min_weight=0)
+    # The d3 interpolators are clamped to the [vmin-vmax] range
+    X = (X - vmin) / (vmax - vmin) if vmax!=vmin else np.zeros_like(X)
+    rgba = colormap(np.clip(X, 0, 1))
+    # The cells are drawn with opacity 0.8 on a white background. Blocks without cells (NaN) are transparent.
+    alpha = rgba[:, :, [3]] * 0.8
+    rgb = rgba[:, :, :3] * alpha + (1 - alpha)
+    return _png_datauri(rgb, verbose=verbose)
+
+
+def _overview_heatmap(df, nodes, color, width, verbose=3):
+    """Rasterize the matrix in the same way as d3heatmap.html draws the cells (ordered by name).
+
+    Parameters
+    ----------
+    df : pd.DataFrame()
+        Input data.
+    nodes : array-like
+        Node names (the columns). Rows are matched with the nodes by name, otherwise by position.
+    color : array-like
+        Cluster label for each of the nodes.
+    width : int
+        Width (and height) of the plotting area in pixels.
+    verbose : int (default : 3)
+        Print to screen. 0: None, 1: Error, 2: Warning, 3: Info, 4: Debug, 5: Trace.
+
+    Returns
+    -------
+    String or None
+        PNG image as data URI.
+
+    """
+    if verbose>=3: print('[d3heatmap] >Rendering overview image.')
+    # d3.scale.category10()
+    palette = np.array([[31, 119, 180], [255, 127, 14], [44, 160, 44], [214, 39, 40], [148, 103, 189], [140, 86, 75], [227, 119, 194], [127, 127, 127], [188, 189, 34], [23, 190, 207]]) / 255
+
+    # Links go from the row label to the column label. Labels that match a node name are replaced by the node index, as in heatmap().
+    n = len(nodes)
+    uinode, idx = np.unique(nodes, return_index=True)
+    pos = dict(zip(uinode, idx))
+    try:
+        rownode = np.array([pos.get(label, label) for label in df.index], dtype=np.intp)
+        colnode = np.array([pos.get(label, label) for label in df.columns], dtype=np.intp)
+    except (TypeError, ValueError):
+        rownode, colnode = np.array([-1]), np.array([-1])
+    if min(rownode.min(initial=0), colnode.min(initial=0))<0 or max(rownode.max(initial=0), colnode.max(initial=0))>=n:
+        if verbose>=2: print('[d3heatmap] >Warning: Overview image is skipped because the row labels can not be matched with the nodes.')
+        return None
+
+    # Default sort order is by name. Bin the sorted positions into (at most) width blocks.
+    A = np.asarray(df.values)
+    order = np.argsort(np.asarray(nodes).astype(str), kind='stable')
+    edges = np.linspace(0, n, min(n, max(int(width), 1)) + 1).astype(int)
+    counts = np.diff(edges)
+    bins = np.empty(n, dtype=np.intp)
+    bins[order] = np.repeat(np.arange(len(counts)), counts)
+
+    # Block sums of the links (only weight>=0 is used) and the node degrees. Rows are processed in chunks to avoid copies of the full matrix.
+    S = np.zeros((len(counts), A.shape[1]))
+    degree = np.zeros(n)
+    step = max(2**18 // max(A.shape[1], 1), 1)
+    for i in range(0, A.shape[0], step):
+        block = np.fmax(A[i:i + step], 0, dtype=float)
+        np.add.at(S, bins[rownode[i:i + step]], block)
+        np.add.at(degree, rownode[i:i + step], block.sum(axis=1))
+        degree += np.bincount(colnode, weights=block.sum(axis=0), minlength=n)
+    # Block sums over the columns
+    Sb = np.zeros((len(counts), len(counts)))
+    np.add.at(Sb.T, bins[colnode], S.T)
+    S = Sb
+
+    # Links are symmetric and also counted on the diagonal.
+    Z = S + S.T
+    Z[np.diag_indices_from(Z)] += np.bincount(bins, weights=degree, minlength=len(counts))
+    Z = Z / np.outer(counts, counts)
+
+    # Fraction of the nodes per cluster in each block
+    ulab, labx = np.unique(np.asarray(color), return_inverse=True)
+    try:
+        colors = palette[ulab.astype(int) % len(palette)]
+    except (TypeError, ValueError):
+        colors = palette[np.arange(len(ulab)) % len(palette)]
+    P = np.zeros((len(counts), len(ulab)))
+    np.add.at(P, (bins, labx.ravel()), 1)
+    P = P / counts[:, None]
+
+    # Cells within the same cluster are colored by cluster, the others are black. Opacity is scaled in range [0-4].
+    rgb = np.stack([(P * colors[:, ch]) @ P.T for ch in range(3)], axis=2)
+    alpha = np.clip(Z / 4, 0, 1)[:, :, None]
+    rgb = rgb * alpha + (0xee / 255) * (1 - alpha)
+    return _png_datauri(rgb, verbose=verbose)
+
+
+def _overview_html(datauri, overview, left, top, width, height):
+    """Create the html for the overview image and the javascript call that draws the interactive layer."""
+    if datauri is None:
+        return '', 'render_heatmap();'
+
+    style = 'display: block; margin-left: %dpx; margin-top: %dpx; width: %dpx; height: %dpx; image-rendering: pixelated;' %(left, top, width, height)
+    if isinstance(overview, str) and overview=='click':
+        OVERVIEW_STR = '<img id="d3_overview" src="%s" style="%s cursor: pointer;" title="Click to load the interactive heatmap">' %(datauri, style)
+        RENDER_STR = 'd3.select("#d3_overview").on("click", render_heatmap);'
+    else:
+        OVERVIEW_STR = '<img id="d3_overview" src="%s" style="%s">' %(datauri, style)
+        # Make sure the overview image is painted before the interactive layer is drawn
+        RENDER_STR = 'window.requestAnimationFrame(function() { setTimeout(render_heatmap, 0); });'
+    return OVERVIEW_STR, RENDER_STR
+
+
+# d3 interpolators with the same colormap in matplotlib. The cubehelix-based (Rainbow, Warm, Cool, CubehelixDefault) and Sinebow are not available.
+_D3_CMAPS = {
+    'interpolateViridis': 'viridis', 'interpolateInferno': 'inferno', 'interpolateMagma': 'magma', 'interpolatePlasma': 'plasma',
+    'interpolateCividis': 'cividis', 'interpolateTurbo': 'turbo',
+    'interpolateBlues': 'Blues', 'interpolateGreens': 'Greens', 'interpolateGreys': 'Greys', 'interpolateOranges': 'Oranges',
+    'interpolatePurples': 'Purples', 'interpolateReds': 'Reds',
+    'interpolateBuGn': 'BuGn', 'interpolateBuPu': 'BuPu', 'interpolateGnBu': 'GnBu', 'interpolateOrRd': 'OrRd',
+    'interpolatePuBuGn': 'PuBuGn', 'interpolatePuBu': 'PuBu', 'interpolatePuRd': 'PuRd', 'interpolateRdPu': 'RdPu',
+    'interpolateYlGnBu': 'YlGnBu', 'interpolateYlGn': 'YlGn', 'interpolateYlOrBr': 'YlOrBr', 'interpolateYlOrRd': 'YlOrRd',
+    'interpolateBrBG': 'BrBG', 'interpolatePRGn': 'PRGn', 'interpolatePiYG': 'PiYG', 'interpolatePuOr': 'PuOr',
+    'interpolateRdBu': 'RdBu', 'interpolateRdGy': 'RdGy', 'interpolateRdYlBu': 'RdYlBu', 'interpolateRdYlGn': 'RdYlGn',
+    'interpolateSpectral': 'Spectral',
+}
+
+
+def _get_colormap(cmap, verbose=3):
+    # Matplotlib colormap that is the same as the d3 interpolator.
+    if cmap not in _D3_CMAPS:
+        if verbose>=2: print('[d3heatmap] >Warning: cmap [%s] is not available for the overview image.' %(cmap))
+        return None
+    try:
+        from matplotlib import colormaps
+    except ImportError:
+        if verbose>=2: print('[d3heatmap] >Warning: matplotlib is required for the overview image. Try: pip install matplotlib')
+        return None
+    return colormaps[_D3_CMAPS[cmap]]
+
+
+def _block_mean(X, shape, min_weight=None):
+    # Downsample the first two axes towards shape by averaging blocks of cells. NaN values (and values below min_weight) are ignored
+    # and blocks without values are NaN. The rows are processed per block to avoid copies of the full matrix.
+    redges, cedges = [np.linspace(0, size, min(size, n) + 1).astype(int) for size, n in zip(X.shape[:2], shape)]
+    out = np.full((len(redges) - 1, len(cedges) - 1) + X.shape[2:], np.nan)
+    for b in range(len(redges) - 1):
+        block = np.asarray(X[redges[b]:redges[b + 1]], dtype=float)
+        valid = ~np.isnan(block) if min_weight is None else block>=min_weight
+        total = np.add.reduceat(np.where(valid, block, 0).sum(axis=0), cedges[:-1], axis=0)
+        count = np.add.reduceat(valid.sum(axis=0), cedges[:-1], axis=0)
+        np.divide(total, count, out=out[b], where=count>0)
+    return out
+
+
+def _png_datauri(rgb, verbose=3):
+    # Encode the image as PNG and embed it as data URI.
+    try:
+        from matplotlib.image import imsave
+    except ImportError:
+        if verbose>=2: print('[d3heatmap] >Warning: matplotlib is required for the overview image. Try: pip install matplotlib')
+        return None
+    buf = io.BytesIO()
+    imsave(buf, np.clip(rgb, 0, 1), format='png')
+    return 'data:image/png;base64,' + base64.b64encode(buf.getvalue()).decode('ascii')
+
+
 # %%  Convert adjacency matrix to vector
 def vec2adjmat(source, target, weight=None, symmetric=True):
     """Convert source and target into adjacency matrix.
@@ -529,7 +980,7 @@ def vec2adjmat(source, target, weight=None, symmetric=True):
 
 
 # %%  Convert adjacency matrix to vector
-def adjmat2vec(adjmat, min_weight=0, verbose=3):
+def adjmat2vec(adjmat, min_weight=0, dtype=None, verbose=3):
     """Convert adjacency matrix into vector with source and target.
 
     Parameters
@@ -540,6 +991,9 @@ def adjmat2vec(adjmat, min_weight=0, verbose=3):
     min_weight : float
         edges are returned with a minimum weight.
 
+    dtype : numpy dtype, (default: None)
+        dtype of the weights, such as 'float32'. None: the dtype of the adjacency matrix is kept.
+
     Returns
     -------
     pd.DataFrame()
@@ -553,16 +1007,32 @@ def adjmat2vec(adjmat, min_weight=0, verbose=3):
     >>> vector = adjmat2vec(adjmat)
 
     """
+    values = adjmat.values
+    index, columns = np.asarray(adjmat.index.values), np.asarray(adjmat.columns.values)
+    nrows, ncols = values.shape
+    # The matrix is processed in blocks of rows (row-wise, similar to stack) and written into the output arrays
+    # without creating the full long-format frame or the positions of all edges first.
+    step = max(2**16 // max(ncols, 1), 1)
+    n = sum(int(np.count_nonzero(values[i:i + step]>=min_weight)) for i in range(0, nrows, step))
+    source, target = np.empty(n, dtype=index.dtype), np.empty(n, dtype=columns.dtype)
+    weight = np.empty(n, dtype=values.dtype if dtype is None else dtype)
+    k = 0
+    for i in range(0, nrows, step):
+        # Remove self loops and no-connected edges
+        # Iloc1 = index[i:i + step, None]!=columns[None, :]
+        Iloc2 = values[i:i + step]>=min_weight
+        # Iloc = Iloc1 & Iloc2
+        Iloc = Iloc2
+        # Take only connected nodes
+        rows, cols = np.nonzero(Iloc)
+        rows += i
+        source[k:k + rows.size] = index[rows]
+        target[k:k + rows.size] = columns[cols]
+        weight[k:k + rows.size] = values[rows, cols]
+        k = k + rows.size
+    # Keep extension dtypes of the labels, such as strings
+    if not isinstance(adjmat.index.dtype, np.dtype): source = pd.array(source, dtype=adjmat.index.dtype)
+    if not isinstance(adjmat.columns.dtype, np.dtype): target = pd.array(target, dtype=adjmat.columns.dtype)
     # Convert adjacency matrix into vector
-    adjmat = adjmat.stack().reset_index()
-    # Set columns
-    adjmat.columns = ['source', 'target', 'weight']
-    # Remove self loops and no-connected edges
-    # Iloc1 = adjmat['source']!=adjmat['target']
-    Iloc2 = adjmat['weight']>=min_weight
-    # Iloc = Iloc1 & Iloc2
-    Iloc = Iloc2
-    # Take only connected nodes
-    adjmat = adjmat.loc[Iloc, :]
-    adjmat.reset_index(drop=True, inplace=True)
+    adjmat = pd.DataFrame({'source': source, 'target': target, 'weight': weight}, copy=False)
     return(adjmat)
\ No newline at end of file
@@ -1,4 +1,163 @@
+import os
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
 import d3heatmap as d3heatmap
+from d3heatmap import d3heatmap as d3
 
 def test_plot():
-	pass
\ No newline at end of file
+	pass
+
+def test_overview(tmp_path):
+	df = d3.import_example(size=(30, 30))
+	# matrix
+	path = str(tmp_path / 'matrix.html')
+	d3.matrix(df, path=path, showfig=False, overview=True, verbose=0)
+	with open(path, 'r') as file: html = file.read()
+	assert 'data:image/png;base64,' in html
+	assert '$OVERVIEW$' not in html and '$RENDER$' not in html
+	# Without overview the interactive layer is drawn directly
+	d3.matrix(df, path=path, showfig=False, verbose=0)
+	with open(path, 'r') as file: html = file.read()
+	assert '<img id="d3_overview"' not in html
+	assert 'render_heatmap();' in html
+	# heatmap
+	path = str(tmp_path / 'heatmap.html')
+	d3.heatmap(df, path=path, color=np.zeros(df.shape[1]), showfig=False, overview='click', verbose=0)
+	with open(path, 'r') as file: html = file.read()
+	assert 'data:image/png;base64,' in html
+	assert 'on("click", render_heatmap)' in html
+	# Non-square input: links go from the row to the column node
+	df = d3.import_example(size=(30, 40))
+	d3.heatmap(df, path=path, color=np.zeros(df.shape[1]), showfig=False, overview=True, verbose=0)
+	with open(path, 'r') as file: assert 'data:image/png;base64,' in file.read()
+	# Rows that are not a node are not drawn by d3: the overview is skipped
+	df = d3.import_example(size=(40, 30))
+	d3.heatmap(df, path=path, color=np.zeros(df.shape[1]), showfig=False, overview=True, verbose=0)
+	with open(path, 'r') as file: assert 'data:image/png;base64,' not in file.read()
+
+def test_block_mean():
+	X = np.arange(16, dtype=float).reshape(4, 4)
+	Y = d3._block_mean(X, (2, 2))
+	assert np.all(Y==np.array([[2.5, 4.5], [10.5, 12.5]]))
+	# Smaller inputs are not changed
+	assert np.all(d3._block_mean(X, (10, 10))==X)
+
+def test_cache(tmp_path):
+	df = d3.import_example(size=(10, 10))
+	cache_dir = str(tmp_path / 'cache')
+	path = str(tmp_path / 'matrix.html')
+	d3.matrix(df, path=path, showfig=False, cache=cache_dir, verbose=0)
+	assert len(os.listdir(cache_dir))==1
+	with open(path, 'r') as file: html = file.read()
+	os.remove(path)
+	# Same data and parameters are copied from cache
+	d3.matrix(df, path=path, showfig=False, cache=cache_dir, verbose=0)
+	with open(path, 'r') as file: assert file.read()==html
+	assert len(os.listdir(cache_dir))==1
+	# Different parameters or data are rendered again
+	d3.matrix(df, path=path, showfig=False, cache=cache_dir, title='other', verbose=0)
+	df.iloc[0, 0] = df.iloc[0, 0] + 1
+	d3.matrix(df, path=path, showfig=False, cache=cache_dir, verbose=0)
+	assert len(os.listdir(cache_dir))==3
+	# Eviction
+	assert len(d3._cache_evict(cache_dir, maxsize=0))==3
+
+def test_dtype(tmp_path):
+	df = d3.import_example(size=(10, 12))
+	# Scaling does not change the input data
+	X = d3._scale(df, dtype='float32', verbose=0)
+	assert np.all(X.dtypes=='float32')
+	assert np.allclose(X.values, np.round(df.values / df.values.max() * 100))
+	assert df.values.dtype.kind=='i'
+	# min/max in a single pass ignores NaN
+	Z = np.arange(10, dtype=float)
+	Z[3] = np.nan
+	assert d3._minmax(Z, chunksize=4)==(0, 9)
+	# adjmat2vec keeps the order of stack
+	df.iloc[1, 2] = -1
+	vec = d3.adjmat2vec(df, dtype='float16')
+	assert vec['weight'].dtype=='float16'
+	assert vec.shape[0]==df.size - 1
+	assert list(vec.iloc[0, :2])==[0, 0] and list(vec.iloc[-1, :2])==[9, 11]
+	path = str(tmp_path / 'matrix.html')
+	d3.matrix(df, path=path, showfig=False, scale=True, dtype='float32', verbose=0)
+
+def test_overview_heatmap_memory():
+	# The matrix is downsampled before it is colored
+	n = 1000
+	df = pd.DataFrame(np.random.rand(n, n).astype('float32'))
+	# Import matplotlib before measuring
+	d3._png_datauri(np.zeros((1, 1, 3)), verbose=0)
+	tracemalloc.start()
+	datauri = d3._overview_heatmap(df, df.columns.astype(str).values, np.random.randint(0, 5, n), 200, verbose=0)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	assert datauri.startswith('data:image/png;base64,')
+	assert peak < 4 * df.values.nbytes
+
+def test_overview_colormap():
+	assert d3._get_colormap('interpolateInferno', verbose=0).name=='inferno'
+	assert d3._get_colormap('interpolateGreens', verbose=0).name=='Greens'
+	# Colormaps that differ between d3 and matplotlib are not used
+	assert d3._get_colormap('interpolateRainbow', verbose=0) is None
+	assert d3._get_colormap('interpolateCool', verbose=0) is None
+
+def test_cache_key(tmp_path):
+	df = d3.import_example(size=(5, 5))
+	key = d3._cache_path(True, df, 'template', [d3heatmap.__version__, 'title'])
+	# Parameters are not read as files
+	title = str(tmp_path / 'index.html')
+	key1 = d3._cache_path(True, df, 'template', [d3heatmap.__version__, title])
+	with open(title, 'w') as file: file.write('content')
+	assert d3._cache_path(True, df, 'template', [d3heatmap.__version__, title])==key1
+	# Template and version are part of the key
+	assert d3._cache_path(True, df, 'other template', [d3heatmap.__version__, 'title'])!=key
+	assert d3._cache_path(True, df, 'template', ['0.0.0', 'title'])!=key
+	# The cache is written atomically without leaving temporary files
+	cache_dir = str(tmp_path / 'cache')
+	d3._cache_store(title, os.path.join(cache_dir, 'key.html'), verbose=0)
+	assert os.listdir(cache_dir)==['key.html']
+
+def test_dtype_memory():
+	n = 1000
+	df = pd.DataFrame(np.random.rand(n, n).astype('float32'))
+	df.iloc[::7, ::3] = -1
+	for min_weight in [-1, 0]:
+		d3.adjmat2vec(df, min_weight=min_weight)
+		tracemalloc.start()
+		vec = d3.adjmat2vec(df, min_weight=min_weight)
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+		# Peak memory is close to the size of the output (source and target labels with the float32 weights)
+		assert peak < 1.2 * vec.memory_usage(index=False).sum()
+	# The maximum is computed on the source data: no overflow for values > 65504
+	X = d3._scale(pd.DataFrame([[1e5, 5e4], [1e3, 2e5]]), dtype='float16', verbose=0)
+	assert np.all(X.values==np.array([[50, 25], [0, 100]]))
+	with pytest.raises(ValueError):
+		d3._scale(df, dtype='int32', verbose=0)
+
+def test_overview_matrix_masked(monkeypatch):
+	# Capture the image instead of encoding it
+	monkeypatch.setattr(d3, '_png_datauri', lambda rgb, verbose=3: rgb)
+	white = lambda rgb: np.all(rgb==1, axis=2)
+	# Cells with negative values or NaN are not drawn by d3. Rows without cells are removed and columns are ordered by first appearance.
+	df = pd.DataFrame([[1, -1, 2], [3, 4, 5], [6, 7, np.nan], [-1, -2, -3]])
+	rgb = d3._overview_matrix(df, 'interpolateRdBu', -3, 7, 100, 100, verbose=0)
+	assert rgb.shape==(3, 3, 3)
+	# Rows are reversed (first row at the bottom) and the columns are ordered as [0, 2, 1]
+	assert np.all(white(rgb)==np.array([[False, True, False], [False, False, False], [False, False, True]]))
+	# A single NaN does not blank the block after downsampling
+	X = np.random.rand(1000, 1000) + 1
+	X[10, 10] = np.nan
+	rgb = d3._overview_matrix(pd.DataFrame(X), 'interpolateInferno', 0, 2, 50, 50, verbose=0)
+	assert rgb.shape==(50, 50, 3)
+	assert not np.any(white(rgb))
+	# Rows without cells are removed
+	X[:20, :] = -1
+	rgb = d3._overview_matrix(pd.DataFrame(X), 'interpolateInferno', 0, 2, 50, 50, verbose=0)
+	assert not np.any(white(rgb))
+	# Blocks without cells are background
+	rgb = d3._overview_matrix(pd.DataFrame(np.where(np.eye(100)>0, 1, -1)), 'interpolateInferno', 0, 2, 10, 10, verbose=0)
+	assert np.all(white(rgb)==(np.eye(10)[::-1]==0))